@@ -14,178 +14,170 @@
 # See: http://www.diveintopython.org/xml_processing/index.html
 # http://python.active-venture.com/lib/dom-example.html
 
-import xml.dom.minidom
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
 import sys
 from subprocess import *
 debug = False
 
-# Only for future reference
-# This prints all the methods that company[0].firstChild can respond to
-        # It's another XML minidom object...
-        #print dir(company[0].firstChild)
-        #print dir(company[0])
+# Namespace prefixes used in the OOXML parts we look at.  ElementTree
+# reports names as {uri}local, so tag names below are written with the
+# usual prefixes and expanded through this table.  Each prefix lists
+# every URI it is bound to: the Transitional one first, then the ISO
+# 29500 Strict one where Strict uses a different URI.
+NS = {
+    'w':       ('http://schemas.openxmlformats.org/wordprocessingml/2006/main',
+                'http://purl.oclc.org/ooxml/wordprocessingml/main'),
+    'pic':     ('http://schemas.openxmlformats.org/drawingml/2006/picture',
+                'http://purl.oclc.org/ooxml/drawingml/picture'),
+    'ds':      ('http://schemas.openxmlformats.org/officeDocument/2006/customXml',
+                'http://purl.oclc.org/ooxml/officeDocument/customXml'),
+    'dc':      ('http://purl.org/dc/elements/1.1/',),
+    'dcterms': ('http://purl.org/dc/terms/',),
+    'cp':      ('http://schemas.openxmlformats.org/package/2006/metadata/core-properties',),
+    'ep':      ('http://schemas.openxmlformats.org/officeDocument/2006/extended-properties',
+                'http://purl.oclc.org/ooxml/officeDocument/extendedProperties'),
+    'rel':     ('http://schemas.openxmlformats.org/package/2006/relationships',),
+}
+
+# returns the ElementTree names for a prefixed tag or attribute name,
+# one per namespace URI of the prefix, e.g. "w:val" ->
+# ("{http://schemas...}val", "{http://purl...}val"); unprefixed names
+# are returned unchanged
+def qnames(name):
+    if ":" not in name:
+        return (name,)
+    prefix, local = name.split(":", 1)
+    return tuple("{%s}%s" % (uri, local) for uri in NS[prefix])
+
+# returns the value of the prefixed attribute name in attrib, whichever
+# of the prefix's namespaces it is in, or None
+def get_attr(attrib, name):
+    for q in qnames(name):
+        val = attrib.get(q)
+        if val is not None:
+            return val
+    return None
+
+# Elements whose attribute values are reported by drillDown(), in the
+# order they are printed for each part:
+#    (tag, attribute, label)
+DRILLDOWN_TAGS = [
+    ("pic:cNvPr",        "name",      "Image"),                  # names associated with images
+    ("w:guid",           "w:val",     "GUID"),                   # GUIDs for customXml info
+    ("w:alias",          "w:val",     "Content-Control-Alias"),  # content control aliases
+    ("w:tag",            "w:val",     "Content-Control"),        # content control tag names
+    ("w:id",             "w:val",     "Content-Control-Id"),     # content control id nums
+    ("ds:datastoreItem", "ds:itemID", "Data-Store-Item-Id"),     # customXml data store ids
+    ("rel:Relationship", "Target",    "Archive-File"),           # files in archive (.rels)
+]
+
+# "Traditional" metadata reported by collectMetadata(), in the order it
+# is printed.  Some metadata is tied specifically to Word or PowerPoint.
+METADATA_TAGS = [
+    ("dcterms:created",       "Created: "),
+    ("dcterms:modified",      "Last-Modified: "),
+    ("dc:creator",            "Creator: "),
+    ("dc:title",              "Title: "),
+    ("dc:subject",            "Subject: "),
+    ("dc:description",        "Description: "),
+    ("cp:keywords",           "Keywords: "),
+    ("cp:revision",           "Revision: "),
+    ("cp:lastModifiedBy",     "LastSavedBy: "),
+    ("ep:Application",        "Generator: "),
+    ("ep:Company",            "Company: "),
+    ("ep:Template",           "Template: "),
+    ("ep:Pages",              "Number-of-Pages: "),
+    ("ep:Lines",              "Number-of-Lines: "),
+    ("ep:Paragraphs",         "Number-of-Paragraphs: "),
+    ("ep:Words",              "Number-of-Words: "),
+    ("ep:Characters",         "Number-of-Characters: "),
+    ("ep:Slides",             "Number-of-Slides: "),
+    ("ep:HiddenSlides",       "Number-of-Hidden-Slides: "),
+    ("ep:Notes",              "Number-of-Notes: "),
+    ("ep:MMClips",            "Number-of-'Multi-Media'-Clips: "),
+    ("ep:PresentationFormat", "Presentation-Format: "),
+]
+
+# the tables above keyed by prefixed name, and the ElementTree name of
+# every tag we look at mapped back to its prefixed name
+DRILLDOWN_ATTRS = dict((tag, attr) for tag, attr, label in DRILLDOWN_TAGS)
+METADATA_NAMES = frozenset(tag for tag, label in METADATA_TAGS)
+TAG_NAMES = dict((q, tag)
+                 for tag in ["w:p", "w:r"] + list(DRILLDOWN_ATTRS) + list(METADATA_NAMES)
+                 for q in qnames(tag))
 
-def process_xml(xmlString):
-    
-    if(len(xmlString)==0): return
-    # print "xml=",xmlString
-    xml_dom = xml.dom.minidom.parseString(xmlString)
-    if debug:
-        u = xml_dom.toprettyxml(" ")
-	print u.encode('ascii','replace')
+# Parameters:
+#    fp - file object positioned at the start of an XML part; it is
+#         parsed as it is read, so the part is never held as one string
+#
+# The part is read in a single pass.  Attributes are picked up on start
+# events (document order), element text on end events, and each finished
+# element is dropped from its parent, so only the open elements are held
+# and memory stays bounded on large parts.  Output is printed afterwards
+# in the fixed order of the tables above.
+def process_xml(fp):
+
+    para = None          # attributes of the first paragraph
+    run = None           # attributes of the first run
+    values = dict((tag, []) for tag in DRILLDOWN_ATTRS)
+    text = {}            # text of the first element of each metadata tag
+
+    open_els = []
+    for event, el in ET.iterparse(fp, events=("start", "end")):
+        tag = TAG_NAMES.get(el.tag)
+        if event == "start":
+            if debug:
+                print "  " * len(open_els) + el.tag, el.attrib
+            open_els.append(el)
+            if tag == "w:p":
+                if para is None:
+                    para = dict(el.attrib)
+            elif tag == "w:r":
+                if run is None:
+                    run = dict(el.attrib)
+            elif tag in DRILLDOWN_ATTRS:
+                values[tag].append(get_attr(el.attrib, DRILLDOWN_ATTRS[tag]))
+        else:
+            open_els.pop()
+            if tag in METADATA_NAMES and tag not in text:
+                text[tag] = el.text
+            if open_els:
+                del open_els[-1][:]
 
     # try to find a paragraph revision ID
     # links settings.xml and styles.xml
-    try:
-        rsid = xml_dom.getElementsByTagName("w:p")[0].getAttribute('w:rsidR')
+    if para is not None:
+        rsid = get_attr(para, 'w:rsidR')
 
         if rsid and not(rsid in revisionIdArray):
-               revisionIdArray.append(rsid)
-	       drillDownOutput("Paragraph-Revision-ID", len(revisionIdArray), rsid)
-     
-    except IndexError:
-        pass  
+            revisionIdArray.add(rsid)
+            drillDownOutput("Paragraph-Revision-ID", len(revisionIdArray), rsid)
 
     # try to find a default paragraph revision ID
     # links to settings.xml and styles.xml
-    try:
-        rsidDef = xml_dom.getElementsByTagName("w:p")[0].getAttribute('w:rsidRDefault')
+    if para is not None:
+        rsidDef = get_attr(para, 'w:rsidRDefault')
 
         if rsidDef and not(rsidDef in idDefaultArray):
-               idDefaultArray.append(rsidDef)
-	       drillDownOutput("Paragraph-Revision-ID-Default", len(revisionIdArray), rsidDef)
-
-    except IndexError:
-        pass    
+            idDefaultArray.add(rsidDef)
+            drillDownOutput("Paragraph-Revision-ID-Default", len(revisionIdArray), rsidDef)
 
     #try to find property text
     #if empty -- ignore
-    try:
-        propertyText = xml_dom.getElementsByTagName("w:r")[0].getAttribute('w:t')
+    if run is not None:
+        propertyText = get_attr(run, 'w:t')
         if not(propertyText in propertyTextArray) and propertyText:
-               propertyTextArray.append(propertyText)
-	       drillDownOutput("Property-Text", len(propertyTextArray), propertyText)
-       
-        #print "Property-Text",propertyText
-    except IndexError:
-        pass 
-    
-    # collect names associated with images
-    try:
-        imageFile = xml_dom.getElementsByTagName("pic:cNvPr")
-        drillDown("Image", imageFile, 'name')
-    except IndexError:
-        pass 
-
-    # get GUIDs from files for customXml info
-    try:
-        guid = xml_dom.getElementsByTagName("w:guid")
-        drillDown("GUID", guid, 'w:val')
-    except IndexError:
-        pass  
-
-    # get aliases for content control's structured data tag
-    try: 
-        sdt_alias = xml_dom.getElementsByTagName("w:alias")
-        drillDown("Content-Control-Alias", sdt_alias, 'w:val')
-    except IndexError:
-        pass 
-    
-    # get tag names for content control's structured data tag
-    try: 
-        sdt_tags = xml_dom.getElementsByTagName("w:tag")
-        drillDown("Content-Control", sdt_tags, 'w:val')
-    except IndexError:
-        pass
-    
-    # get id nums for content control's structured data tag
-    try: 
-        sdt_ids = xml_dom.getElementsByTagName("w:id")
-        drillDown("Content-Control-Id", sdt_ids, 'w:val')
-    except IndexError:
-        pass
-
-    # get data store id nums from customXml part
-    try: 
-        dataStore_ids = xml_dom.getElementsByTagName("ds:datastoreItem")
-        drillDown("Data-Store-Item-Id", dataStore_ids, 'ds:itemID')
-    except IndexError:
-        pass
- 
-    # get relationship information (files in archive) from document.xml.rels  
-    try: 
-        relTarget = xml_dom.getElementsByTagName("Relationship")
-        drillDown("Archive-File", relTarget, 'Target')
-    except IndexError:
-        pass
-
-    # Attempt to retrieve "traditional" metadata
-    # Some metadata is tied specifically to Word or PowerPoint
-    createdDate = xml_dom.getElementsByTagName("dcterms:created")
-    collectMetadata(createdDate, "Created: ")
-
-    modifiedDate = xml_dom.getElementsByTagName("dcterms:modified")
-    collectMetadata(modifiedDate, "Last-Modified: ")
-
-    creator = xml_dom.getElementsByTagName("dc:creator")
-    collectMetadata(creator, "Creator: ")   
-
-    title = xml_dom.getElementsByTagName("dc:title")
-    collectMetadata(title, "Title: ")
-
-    subject = xml_dom.getElementsByTagName("dc:subject")
-    collectMetadata(subject, "Subject: ")
-
-    description = xml_dom.getElementsByTagName("dc:description")
-    collectMetadata(description, "Description: ")
+            propertyTextArray.add(propertyText)
+            drillDownOutput("Property-Text", len(propertyTextArray), propertyText)
 
-    keywords = xml_dom.getElementsByTagName("cp:keywords")
-    collectMetadata(keywords, "Keywords: ")
+    for tag, attr, label in DRILLDOWN_TAGS:
+        drillDown(label, values[tag])
 
-    revisionNum = xml_dom.getElementsByTagName("cp:revision")
-    collectMetadata(revisionNum, "Revision: ")
-
-    lastMod = xml_dom.getElementsByTagName("cp:lastModifiedBy") 
-    collectMetadata(lastMod, "LastSavedBy: ")   
-
-    application = xml_dom.getElementsByTagName("Application")
-    collectMetadata(application, "Generator: ")  
-        
-    company = xml_dom.getElementsByTagName("Company")
-    collectMetadata(company, "Company: ")  
-
-    template = xml_dom.getElementsByTagName("Template")
-    collectMetadata(template, "Template: ")  
-
-    pages = xml_dom.getElementsByTagName("Pages")
-    collectMetadata(pages, "Number-of-Pages: ") 
-
-    lines = xml_dom.getElementsByTagName("Lines")
-    collectMetadata(lines, "Number-of-Lines: ") 
-
-    paragraphs = xml_dom.getElementsByTagName("Paragraphs")
-    collectMetadata(paragraphs, "Number-of-Paragraphs: ") 
-
-    words = xml_dom.getElementsByTagName("Words")
-    collectMetadata(words, "Number-of-Words: ") 
-
-    characters = xml_dom.getElementsByTagName("Characters")
-    collectMetadata(characters, "Number-of-Characters: ") 
-
-    slides = xml_dom.getElementsByTagName("Slides")
-    collectMetadata(slides, "Number-of-Slides: ") 
-
-    hiddenSlides = xml_dom.getElementsByTagName("HiddenSlides")
-    collectMetadata(hiddenSlides, "Number-of-Hidden-Slides: ") 
-
-    notesPages = xml_dom.getElementsByTagName("Notes")
-    collectMetadata(notesPages, "Number-of-Notes: ") 
-
-    mediaClips = xml_dom.getElementsByTagName("MMClips")
-    collectMetadata(mediaClips, "Number-of-'Multi-Media'-Clips: ") 
-
-    presFormat = xml_dom.getElementsByTagName("PresentationFormat")
-    collectMetadata(presFormat, "Presentation-Format: ")  
+    for tag, label in METADATA_TAGS:
+        collectMetadata(text.get(tag), label)
     
 
 # method drills into xml when there is more than one element
@@ -195,52 +187,19 @@ def process_xml(xmlString):
 #
 # Parameters
 #    label     - to be printed with value of attribute
-#    tag_array - array of minidom objects 
-#    tag_name  - value to be obtained  
-def drillDown(label, tag_array, tag_name):
-    total_count = range(0, tag_array.length)
-
-    for x in total_count:
-          val = tag_array[x].getAttribute(tag_name)
-          if val:
-
-            if label.startswith("Archive-File"):
-               if not(val in targetArray):
-                  targetArray.append(val)
-                  drillDownOutput(label, len(targetArray), val)
+#    vals      - attribute values, in document order
+def drillDown(label, vals):
+    seen = DRILLDOWN_SEEN.get(label)
 
-            elif label.endswith("Content-Control"):
-		 if not(val in sdtTagArray):
-                    sdtTagArray.append(val)
-                    drillDownOutput(label, len(sdtTagArray), val)
+    for val in vals:
+        if not val:
+            continue
+        if seen is None:
+            print label + ":",val
+        elif not(val in seen):
+            seen.add(val)
+            drillDownOutput(label, len(seen), val)
 
-            elif label.endswith("Content-Control-Id"):
-		 if not(val in sdtIdArray):
-                    sdtIdArray.append(val)
-		    drillDownOutput(label, len(sdtIdArray), val)
-
-            elif label.endswith("Content-Control-Alias"):
-		 if not(val in sdtAliasArray):
-                    sdtAliasArray.append(val)
-		    drillDownOutput(label, len(sdtAliasArray), val)
-
-            elif label.endswith("GUID"):
-		 if not(val in GUID_Array):
-                    GUID_Array.append(val)
-		    drillDownOutput(label, len(GUID_Array), val)
-
-            elif label.endswith("Data-Store-Item-Id"):
-		 if not(val in dataStoreArray):
-                    dataStoreArray.append(val)
-		    drillDownOutput(label, len(dataStoreArray), val)
-
-            elif label.endswith("Image"):
-		 if not(val in imageArray):
-                    imageArray.append(val)
-		    drillDownOutput(label, len(imageArray), val)
-            else:
-                 print label + ":",val        
-       
 
 # method prints the output in label : value format (DGI)
 # Parameters:
@@ -252,15 +211,14 @@ def drillDownOutput(label, count, value):
     print label+ `count` + ":",value
             
     
-# method prints metadata associated with an array
-# of minidom objects, and prints label and value
-# if one exists
+# method prints the label and text of a metadata
+# element if one was found
 # Parameters:
-#    tagArray - array of minidom objects
+#    text     - text of the first element with the tag, or None
 #    label    - to be printed with text of object 
-def collectMetadata(tagArray, label):
-    if tagArray and tagArray[0].hasChildNodes():
-        text = tagArray[0].firstChild.wholeText.strip().replace("\r"," ").replace("\n"," ")
+def collectMetadata(text, label):
+    if text is not None:
+        text = text.strip().replace("\r"," ").replace("\n"," ")
         print label,text
 
 def process(fn):
@@ -273,25 +231,42 @@ def process(fn):
         return
 
     z = zipfile.ZipFile(fn,mode="r")
-    for f in z.namelist():
-        if f.endswith(".xml") or f.endswith(".rels"):
-            process_xml(z.open(f).read())
+    try:
+        # the central directory entries already carry name and size, so
+        # media and empty parts are skipped without being opened
+        for info in z.infolist():
+            if not info.filename.endswith((".xml", ".rels")): continue
+            if info.file_size == 0: continue
+            with z.open(info) as fp:
+                process_xml(fp)
+    finally:
+        z.close()
 
         
           
 
-#define and initialize arrays/lists for tags        
-targetArray = []
-idDefaultArray = []
-revisionIdArray = []
-sdtTagArray = []
-sdtIdArray = []
-sdtAliasArray = []
-imageArray = []
-GUID_Array = []
-dataStoreArray = []
-propertyTextArray = []
-imageArray = []
+#define and initialize sets of values already reported for each tag
+targetArray = set()
+idDefaultArray = set()
+revisionIdArray = set()
+sdtTagArray = set()
+sdtIdArray = set()
+sdtAliasArray = set()
+imageArray = set()
+GUID_Array = set()
+dataStoreArray = set()
+propertyTextArray = set()
+
+# drillDown() label -> set of values already reported for it
+DRILLDOWN_SEEN = {
+    "Archive-File":          targetArray,
+    "Content-Control":       sdtTagArray,
+    "Content-Control-Id":    sdtIdArray,
+    "Content-Control-Alias": sdtAliasArray,
+    "GUID":                  GUID_Array,
+    "Data-Store-Item-Id":    dataStoreArray,
+    "Image":                 imageArray,
+}
 
 #start the program here
 if (len(sys.argv) < 2):
@@ -15,36 +15,172 @@
 import zipfile
 from subprocess import *
 import re
+from collections import deque
+import multiprocessing
+import signal
 debug = False
 gap = 4
 
-def docx_grep(pattern,fname):
-    r = re.compile(pattern)
+# yields the lines of a zip member a buffer at a time, split the same
+# way as data.split("\n") would split the whole member
+def member_lines(f):
+    line = ""
+    for line in f:
+        if line.endswith("\n"):
+            yield line[:-1]
+        else:
+            yield line
+    if line.endswith("\n"):
+        yield ""
+
+# Scans lines for r and yields, for each matching line n, the block of
+# (lineno,line) pairs from n-gap to n+gap.  Only the last gap lines and
+# the blocks still waiting for their trailing context are kept, so the
+# input is never held in memory as a whole.
+def match_blocks(r,lines):
+    before = deque(maxlen=gap)
+    pending = []                        # [block, lines still wanted]
+    for n, line in enumerate(lines):
+        for p in pending:
+            p[0].append((n,line))
+            p[1] -= 1
+        while pending and pending[0][1]==0:
+            yield pending.pop(0)[0]
+        if r.search(line):
+            pending.append([list(before) + [(n,line)], gap])
+            if gap==0:
+                yield pending.pop()[0]
+        before.append((n,line))
+    for block, wanted in pending:
+        yield block
+
+# Returns the output lines for member name of the open ZipFile z,
+# which was opened from fname.
+def grep_member(r,z,fname,name):
+    out = []
+    f = z.open(name)
+    try:
+        first = f.peek(1)[:1]
+        if len(first)==0:
+            return out
+        if first=='<':
+            # pretty-printing needs the whole part
+            lines = xml.dom.minidom.parseString(f.read()).toprettyxml(" ").split("\n")
+        else:
+            lines = member_lines(f)
+        for block in match_blocks(r,lines):
+            for (i,line) in block:
+                out.append("%s:%s:%4d   %s" % (fname,name,i,line))
+            out.append("")
+    finally:
+        f.close()
+    return out
+
+# Returns the output lines for each of a run of members of fname.  Run
+# by pool workers; the archive is opened once per batch and closed
+# before returning, so no handle outlives the job.
+def grep_batch(args):
+    r, fname, names = args
     z = zipfile.ZipFile(fname,"r")
-    for name in z.namelist():
-        data = z.read(name)
-        if len(data)==0: continue
-        if data[0]=='<':
-            data = xml.dom.minidom.parseString(data).toprettyxml(" ")
-        lines = data.split("\n")
-        for n in range(0,len(lines)):
-            m = r.search(lines[n])
-            if m:
-                for i in range(n-gap,n+gap+1):
-                    if i<0 or i>=len(lines): continue
-                    print "%s:%s:%4d   %s" % (fname,name,i,lines[i])
-                print ""
+    try:
+        return [grep_member(r,z,fname,name) for name in names]
+    finally:
+        z.close()
 
+# Pool workers leave SIGINT to the parent, which terminates the pool
+def ignore_sigint():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
 
-if(__name__=="__main__"):
-    if(len(sys.argv)!=3):
-        print "usage: %s pattern file" % (sys.argv[0])
-    for f in sys.argv[2:]:
-        try:
-            docx_grep(sys.argv[1],f)
-            print ""
-            print ""
-            print "====================="
-        except zipfile.BadZipfile:
-            print "%s is not a zip file" % f
+# Seconds to wait for one pooled result.  Waiting with a timeout keeps
+# the parent interruptible; without one Ctrl-C cannot stop the wait.
+RESULT_WAIT = 60*60*24*365
+
+# Batches handed to each pool worker, for load balancing
+BATCHES_PER_WORKER = 4
+
+# Uncompressed bytes of XML parts below which an archive is searched
+# serially.  Pretty-printing runs at about 1 MB/s, so this much XML
+# takes about twice as long to search as the pool takes to start.
+PARALLEL_MIN_XML = 256*1024
+
+# Pool shared by every archive searched in this process, started by
+# get_pool() the first time an archive is large enough to need it
+_pool = None
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = multiprocessing.Pool(initializer=ignore_sigint)
+    return _pool
 
+def is_xml_part(info):
+    return info.filename.endswith((".xml",".rels"))
+
+# Yields the output lines of each member in infos, searched by the pool
+# in contiguous batches of about equal uncompressed size, in archive
+# order.  Jobs carry the compiled pattern, which pickles with its flags.
+def grep_parallel(r,fname,infos):
+    total = sum(info.file_size for info in infos)
+    target = total // (multiprocessing.cpu_count()*BATCHES_PER_WORKER) + 1
+    jobs = []
+    names = []
+    size = 0
+    for info in infos:
+        names.append(info.filename)
+        size += info.file_size
+        if size>=target:
+            jobs.append((r,fname,names))
+            names = []
+            size = 0
+    if names:
+        jobs.append((r,fname,names))
+    it = get_pool().imap(grep_batch, jobs)
+    for job in jobs:
+        for out in it.next(RESULT_WAIT):
+            yield out
+
+# Searches every member of fname for the compiled pattern r.  If
+# parallel is set, the host has more than one CPU and the XML parts
+# (the parts that are costly to search) add up to PARALLEL_MIN_XML
+# bytes, the members are searched by the shared pool; output is still
+# printed in archive order.
+def docx_grep(r,fname,parallel=False):
+    z = zipfile.ZipFile(fname,"r")
+    try:
+        infos = z.infolist()
+        xml_size = sum(info.file_size for info in infos if is_xml_part(info))
+        if parallel and xml_size>=PARALLEL_MIN_XML and multiprocessing.cpu_count()>1:
+            z.close()
+            results = grep_parallel(r,fname,infos)
+        else:
+            results = (grep_member(r,z,fname,info.filename) for info in infos)
+        for out in results:
+            for line in out:
+                print line
+    finally:
+        z.close()
+
+
+if(__name__=="__main__"):
+    args = sys.argv[1:]
+    parallel = args[:1]==["-j"]
+    if parallel:
+        args = args[1:]
+    if(len(args)!=2):
+        print "usage: %s [-j] pattern file" % (sys.argv[0])
+        print "  -j  search large archives with a pool of worker processes"
+    if(len(args)<2):
+        sys.exit()
+    r = re.compile(args[0])
+    try:
+        for f in args[1:]:
+            try:
+                docx_grep(r,f,parallel)
+                print ""
+                print ""
+                print "====================="
+            except zipfile.BadZipfile:
+                print "%s is not a zip file" % f
+    finally:
+        if _pool is not None:
+            _pool.terminate()
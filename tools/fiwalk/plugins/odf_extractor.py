@@ -11,71 +11,83 @@
 
 # Usage: odf_extractor filename.od*
  
-import xml.dom.minidom
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
 import sys
-from subprocess import *
+import zipfile
 
-def process_xml(xmlString):
-    if(len(xmlString)==0): return
-    # print "xml=",xmlString
-    xml_dom = xml.dom.minidom.parseString(xmlString)
-    # print xml_dom.toprettyxml(" ")
-     
-    #output the metadata
-
-    createdDate = xml_dom.getElementsByTagName("meta:creation-date")
-    if createdDate and createdDate[0].hasChildNodes(): 
-        print "CreatedDate: ",createdDate[0].firstChild.wholeText
-
-    date = xml_dom.getElementsByTagName("dc:date")
-    if date and date[0].hasChildNodes(): 
-        print "Last-Modified: ",date[0].firstChild.wholeText
+META = '{urn:oasis:names:tc:opendocument:xmlns:meta:1.0}'
+DC = '{http://purl.org/dc/elements/1.1/}'
 
-    creator = xml_dom.getElementsByTagName("dc:creator")   
-    if creator and creator[0].hasChildNodes():
-        print "Creator: ",creator[0].firstChild.wholeText
+# Metadata elements whose text is printed, in output order
+METADATA_TAGS = [
+    (META + 'creation-date',     "CreatedDate: "),
+    (DC + 'date',                "Last-Modified: "),
+    (DC + 'creator',             "Creator: "),
+    (META + 'initial-creator',   "Initial Creator: "),
+    (META + 'editing-cycles',    "Revision: "),
+    (META + 'generator',         "Generator: "),
+]
+METADATA_QNAMES = frozenset(tag for tag, label in METADATA_TAGS)
 
-    initialCreator = xml_dom.getElementsByTagName("meta:initial-creator")
-    if initialCreator and initialCreator[0].hasChildNodes():
-        print "Initial Creator: ",initialCreator[0].firstChild.wholeText
-
-    revisionNum = xml_dom.getElementsByTagName("meta:editing-cycles")
-    if revisionNum and revisionNum[0].hasChildNodes():
-        print "Revision: ",revisionNum[0].firstChild.wholeText
+# Parameters:
+#    fp - file object positioned at the start of an XML part
+def process_xml(fp):
+    # one pass over the part: keep the text of the first element of each
+    # metadata tag and the attributes of the first document-statistic.
+    # Each finished element is dropped from its parent, so only the open
+    # elements are held and memory stays bounded on large parts such as
+    # content.xml.
+    text = {}
+    documentStats = None
+    open_els = []
+    for event, el in ET.iterparse(fp, events=("start", "end")):
+        if event == "start":
+            open_els.append(el)
+            if el.tag == META + 'document-statistic' and documentStats is None:
+                documentStats = dict(el.attrib)
+        else:
+            open_els.pop()
+            if el.tag in METADATA_QNAMES and el.tag not in text:
+                text[el.tag] = el.text
+            if open_els:
+                del open_els[-1][:]
+     
+    #output the metadata
 
-    application = xml_dom.getElementsByTagName("meta:generator")
-    if application and application[0].hasChildNodes():
-        print "Generator: ",application[0].firstChild.wholeText  
+    for tag, label in METADATA_TAGS:
+        if text.get(tag) is not None:
+            print label,text[tag]
 
-    try:
-        documentStats = xml_dom.getElementsByTagName("meta:document-statistic")
-        collectAll("Number-of-Characters: ", documentStats, 'meta:character-count')
-        collectAll("Number-of-Words: ", documentStats, 'meta:word-count')
-        collectAll("Number-of-Paragraphs: ", documentStats, 'meta:paragraph-count')
-        collectAll("Number-of-Pages: ", documentStats, 'meta:page-count') 
-        collectAll("Number-of-Images: ", documentStats, 'meta:image-count') 
-        collectAll("Number-of-Objects: ", documentStats, 'meta:object-count') 
-        collectAll("Number-of-Tables: ", documentStats, 'meta:table-count') 
-    except IndexError:
-        pass 
+    if documentStats is not None:
+        collectAll("Number-of-Characters: ", documentStats, 'character-count')
+        collectAll("Number-of-Words: ", documentStats, 'word-count')
+        collectAll("Number-of-Paragraphs: ", documentStats, 'paragraph-count')
+        collectAll("Number-of-Pages: ", documentStats, 'page-count') 
+        collectAll("Number-of-Images: ", documentStats, 'image-count') 
+        collectAll("Number-of-Objects: ", documentStats, 'object-count') 
+        collectAll("Number-of-Tables: ", documentStats, 'table-count') 
 
-def collectAll(label, tag_array, tag_name):
-    val = tag_array[0].getAttribute(tag_name)
+def collectAll(label, stats, stat_name):
+    val = stats.get(META + stat_name)
     if val:
           print label + val  
 
 def process(fn):
     try:
        """Process a file fn"""
-       unzip_output = Popen(['unzip','-l',fn],stdout=PIPE).stdout.read()
-       files = unzip_output.split("\n")
-       files = files[3:-3]
-       files = [x[28:] for x in files] # now we have a list of all the files in the zip archive
-       for f in files:
-           if f.endswith(".xml"):
-              null = open("/dev/null","w")
-              process_xml(Popen(['unzip','-p',fn,f],stdout=PIPE,stderr=null).stdout.read())
-    except IOError, err:
+       z = zipfile.ZipFile(fn,mode="r")
+       try:
+           for info in z.infolist():
+               if not info.filename.endswith(".xml"): continue
+               if info.file_size == 0: continue
+               with z.open(info) as fp:
+                   process_xml(fp)
+       finally:
+           z.close()
+    except (IOError, zipfile.BadZipfile), err:
            print "Error opening ", fn, err
            sys.exit()
         